@@ -3,14 +3,35 @@ Transformational and inquiry functions for ragged arrays.
 """
 
 import warnings
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Iterable, Iterator
 from concurrent import futures
 from datetime import timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 import numpy as np
 import pandas as pd
 import xarray as xr
 
+if TYPE_CHECKING:
+    import dask.array as da
+
+# Average number of elements per row below which ``apply_ragged`` runs ``func``
+# sequentially rather than in a thread pool when no executor is given.
+_MIN_ROWSIZE_THREADED = 1000
+
+# Largest array-like ``subset`` criterion compared value by value rather than
+# searched for; measured 2-20x faster than a sorted search on 5M values.
+_MAX_ISIN_EQUALITIES = 8
+
+# Number of observations per index up to which ``obs_index_to_row`` gathers
+# rows from a table; measured faster than searchsorted from about 5% on 10M obs.
+_MAX_OBS_PER_INDEX_LOOKUP = 32
+
+# Offset of the first chunk for each ``align`` option of ``chunk``, in units of
+# half of the number of elements that do not fit in the chunks.
+_ALIGN = {"start": 0, "middle": 1, "end": 2}
+
 
 def apply_ragged(
     func: callable,
@@ -19,7 +40,7 @@ def apply_ragged(
     *args: tuple,
     rows: int | Iterable[int] = None,
     axis: int = 0,
-    executor: futures.Executor = futures.ThreadPoolExecutor(max_workers=None),
+    executor: futures.Executor | None = None,
     **kwargs: dict,
 ) -> tuple[np.ndarray] | np.ndarray:
     """Apply a function to a ragged array.
@@ -29,19 +50,33 @@ def apply_ragged(
     concatenated into a single ragged array.
 
     You can pass ``arrays`` as NumPy arrays or xarray DataArrays, however,
-    the result will always be a NumPy array. Passing ``rows`` as an integer or
+    the result will always be a NumPy array. The rows are passed to ``func`` as
+    views of the input arrays without copying them, so ``func`` should not
+    modify its inputs in place. Passing ``rows`` as an integer or
     a sequence of integers will make ``apply_ragged`` process and return only
     those specific rows, and otherwise, all rows in the input ragged array will
     be processed. Further, you can use the ``axis`` parameter to specify the
     ragged axis of the input array(s) (default is 0).
 
-    By default this function uses ``concurrent.futures.ThreadPoolExecutor`` to
-    run ``func`` in multiple threads. The number of threads can be controlled by
-    passing the ``max_workers`` argument to the executor instance passed to
-    ``apply_ragged``. Alternatively, you can pass the ``concurrent.futures.ProcessPoolExecutor``
-    instance to use processes instead. Passing alternative (3rd party library)
-    concurrent executors may work if they follow the same executor interface as
-    that of ``concurrent.futures``, however this has not been tested yet.
+    By default this function creates a ``concurrent.futures.ThreadPoolExecutor``
+    for the duration of the call to run ``func`` in multiple threads, with one
+    thread per row up to 32 threads. When the rows are short on average, the
+    overhead of creating and collecting one future per row outweighs any gain
+    from threading, so ``func`` is instead called on each row sequentially in
+    the calling thread. You can also pass your own executor instance, for
+    example a ``concurrent.futures.ThreadPoolExecutor`` with a chosen number of
+    ``max_workers`` or a ``concurrent.futures.ProcessPoolExecutor`` to use
+    processes instead; ``apply_ragged`` does not shut down executors that are
+    passed to it. Passing alternative (3rd party library) concurrent executors
+    may work if they follow the same executor interface as that of
+    ``concurrent.futures``, however this has not been tested yet.
+
+    If ``func`` has a truthy ``__vectorized__`` attribute, it is called only
+    once as ``func(*arrays, indices, *args, **kwargs)``, where ``indices`` are
+    the row boundaries along the ragged axis as returned by
+    :func:`rowsize_to_index`, and its output is returned as is. This lets a
+    function that can process all rows at once in NumPy skip the per-row
+    dispatch entirely.
 
     Parameters
     ----------
@@ -59,9 +94,10 @@ def apply_ragged(
     axis : int, optional
         The ragged axis of the input arrays. Default is 0.
     executor : concurrent.futures.Executor, optional
-        Executor to use for concurrent execution. Default is ``ThreadPoolExecutor``
-        with the default number of ``max_workers``.
-        Another supported option is ``ProcessPoolExecutor``.
+        Executor to use for concurrent execution, for example ``ThreadPoolExecutor``
+        or ``ProcessPoolExecutor``. Default is ``None``, which creates a
+        ``ThreadPoolExecutor`` for this call only, or applies ``func`` to each
+        row sequentially if the rows are short.
     **kwargs : dict
         Additional keyword arguments to pass to ``func``.
 
@@ -101,6 +137,20 @@ def apply_ragged(
     >>> v1
     array([1., 1., 1., 1., 1.])
 
+    A function that processes all rows at once can be marked as vectorized; it
+    then receives the row boundaries instead of being called once per row. The
+    row sums below are differences of a cumulative sum, which unlike
+    ``np.add.reduceat`` are also correct for empty rows:
+
+    >>> def demean(x, indices):
+    ...     rowsize = np.diff(indices)
+    ...     sums = np.diff(np.concatenate(([0], np.cumsum(x)))[indices])
+    ...     means = sums / np.maximum(rowsize, 1)
+    ...     return x - np.repeat(means, rowsize)
+    >>> demean.__vectorized__ = True
+    >>> apply_ragged(demean, x, rowsize)
+    array([-0.5,  0.5, -2. ,  0. ,  2. , -4.5, -1.5,  1.5,  4.5])
+
     Raises
     ------
     ValueError
@@ -112,17 +162,57 @@ def apply_ragged(
     if not isinstance(arrays, (list, tuple)):
         arrays = [arrays]
     # validate rowsize
+    rowsize = np.asarray(rowsize)
+    total = int(np.sum(rowsize))
     for arr in arrays:
-        if not np.sum(rowsize) == arr.shape[axis]:
+        if not total == arr.shape[axis]:
             raise ValueError("The sum of rowsize must equal the length of arr.")
 
-    # split the array(s) into rows
-    arrays = [unpack(np.array(arr), rowsize, rows, axis) for arr in arrays]
-    iter = [[arrays[i][j] for i in range(len(arrays))] for j in range(len(arrays[0]))]
+    # a vectorized func processes all (selected) rows in a single call
+    if getattr(func, "__vectorized__", False):
+        if rows is not None:
+            rows = _normalize_rows(rows, rowsize.size)
+            arrays = [
+                np.concatenate(unpack(np.asarray(arr), rowsize, rows, axis), axis=axis)
+                for arr in arrays
+            ]
+            rowsize = rowsize[rows]
+        else:
+            arrays = [np.asarray(arr) for arr in arrays]
+        return func(*arrays, rowsize_to_index(rowsize), *args, **kwargs)
 
-    # parallel execution
-    res = [executor.submit(func, *x, *args, **kwargs) for x in iter]
-    res = [r.result() for r in res]
+    # take the row(s) of each array as views along the ragged axis
+    indices = rowsize_to_index(rowsize)
+    if rows is None:
+        rows = range(indices.size - 1)
+        num_obs = total
+    else:
+        rows = _normalize_rows(rows, indices.size - 1)
+        num_obs = int(np.sum(rowsize[rows]))
+    arrays = [np.asarray(arr) for arr in arrays]
+    bounds = indices.tolist()
+    slices = [(slice(None),) * axis + (slice(bounds[j], bounds[j + 1]),) for j in rows]
+
+    # the views of a row are only taken right before func is called on them, so
+    # that all the variables of a row are processed back to back
+    if executor is None:
+        if num_obs <= _MIN_ROWSIZE_THREADED * len(slices):
+            res = [func(*[arr[s] for arr in arrays], *args, **kwargs) for s in slices]
+        else:
+            # parallel execution in a pool owned by this call
+            with futures.ThreadPoolExecutor(max_workers=min(32, len(slices))) as pool:
+                res = [
+                    pool.submit(func, *[arr[s] for arr in arrays], *args, **kwargs)
+                    for s in slices
+                ]
+                res = [r.result() for r in res]
+    else:
+        # parallel execution
+        res = [
+            executor.submit(func, *[arr[s] for arr in arrays], *args, **kwargs)
+            for s in slices
+        ]
+        res = [r.result() for r in res]
 
     # Concatenate the outputs.
 
@@ -245,28 +335,12 @@ def chunk(
         If ``length < 0``.
     ValueError
         If ``align not in ["start", "middle", "end"]``.
+    ValueError
+        If ``x`` is not one-dimensional.
     ZeroDivisionError
         if ``length == 0``.
     """
-    num_chunks = (len(x) - length) // (length - overlap) + 1 if len(x) >= length else 0
-    remainder = len(x) - num_chunks * length + (num_chunks - 1) * overlap
-    res = np.empty((num_chunks, length), dtype=np.array(x).dtype)
-
-    if align == "start":
-        start = 0
-    elif align == "middle":
-        start = remainder // 2
-    elif align == "end":
-        start = remainder
-    else:
-        raise ValueError("align must be one of 'start', 'middle', or 'end'.")
-
-    for n in range(num_chunks):
-        end = start + length
-        res[n] = x[start:end]
-        start = end - overlap
-
-    return res
+    return _make_chunker(length, overlap, align)(np.asarray(x))
 
 
 def prune(
@@ -302,27 +376,23 @@ def prune(
     ValueError
         If the sum of ``rowsize`` does not equal the length of ``arrays``.
     IndexError
-        If empty ``ragged``.
+        If ``rowsize`` is empty.
 
     See Also
     --------
     :func:`segment`, `chunk`
     """
+    ragged = np.asarray(ragged)
+    rowsize = np.asarray(rowsize)
 
-    ragged = apply_ragged(
-        lambda x, min_len: x if len(x) >= min_len else np.empty(0, dtype=x.dtype),
-        np.array(ragged),
-        rowsize,
-        min_len=min_rowsize,
-    )
-    rowsize = apply_ragged(
-        lambda x, min_len: x if x >= min_len else np.empty(0, dtype=x.dtype),
-        np.array(rowsize),
-        np.ones_like(rowsize),
-        min_len=min_rowsize,
-    )
+    if rowsize.size == 0:
+        raise IndexError("The ragged array must have at least one row.")
+    if not np.sum(rowsize) == len(ragged):
+        raise ValueError("The sum of rowsize must equal the length of ragged.")
 
-    return ragged, rowsize
+    # keep the rows that are long enough, and all of their elements
+    keep = rowsize >= min_rowsize
+    return ragged[np.repeat(keep, rowsize)], rowsize[keep]
 
 
 def ragged_to_regular(
@@ -374,10 +444,19 @@ def ragged_to_regular(
     --------
     :func:`regular_to_ragged`
     """
-    res = fill_value * np.ones((len(rowsize), int(max(rowsize))), dtype=ragged.dtype)
-    unpacked = unpack(ragged, rowsize)
-    for n in range(len(rowsize)):
-        res[n, : int(rowsize[n])] = unpacked[n]
+    ragged = np.asarray(ragged)
+    rowsize = np.asarray(rowsize, dtype=np.int64)
+    res = np.full(
+        (len(rowsize), int(max(rowsize))),
+        fill_value,
+        dtype=np.result_type(fill_value, ragged.dtype),
+    )
+
+    # scatter all elements at once using their row and column indices
+    indices = rowsize_to_index(rowsize)
+    row_idx = np.repeat(np.arange(len(rowsize)), rowsize)
+    col_idx = np.arange(indices[-1]) - indices[row_idx]
+    res[row_idx, col_idx] = ragged
     return res
 
 
@@ -420,7 +499,7 @@ def regular_to_ragged(
         valid = ~np.isnan(array)
     else:
         valid = array != fill_value
-    return array[valid], np.sum(valid, axis=1)
+    return array[valid], np.count_nonzero(valid, axis=1)
 
 
 def rowsize_to_index(rowsize: list | np.ndarray | xr.DataArray) -> np.ndarray:
@@ -437,7 +516,7 @@ def rowsize_to_index(rowsize: list | np.ndarray | xr.DataArray) -> np.ndarray:
     Returns
     -------
     np.ndarray
-        A list of indices.
+        A list of indices, as a contiguous array of ``int64``.
 
     Examples
     --------
@@ -446,7 +525,11 @@ def rowsize_to_index(rowsize: list | np.ndarray | xr.DataArray) -> np.ndarray:
     >>> rowsize_to_index([100, 202, 53])
     array([  0, 100, 302, 355])
     """
-    return np.cumsum(np.insert(np.array(rowsize), 0, 0))
+    rowsize = np.asarray(rowsize)
+    index = np.empty(rowsize.size + 1, dtype=np.int64)
+    index[0] = 0
+    np.cumsum(rowsize, out=index[1:])
+    return index
 
 
 def segment(
@@ -528,24 +611,30 @@ def segment(
     else:
         positive_tol = tolerance >= 0
 
+    if rowsize is not None and not np.sum(rowsize) == len(x):
+        raise ValueError("The sum of rowsize must equal the length of x.")
+
+    if positive_tol:
+        exceeds_tolerance = np.diff(x) > tolerance
+    else:
+        exceeds_tolerance = np.diff(x) < tolerance
+
     if rowsize is None:
-        if positive_tol:
-            exceeds_tolerance = np.diff(x) > tolerance
-        else:
-            exceeds_tolerance = np.diff(x) < tolerance
-        segment_sizes = np.diff(np.insert(np.where(exceeds_tolerance)[0] + 1, 0, 0))
-        segment_sizes = np.append(segment_sizes, len(x) - np.sum(segment_sizes))
-        return segment_sizes
+        breaks = np.flatnonzero(exceeds_tolerance) + 1
+        boundaries = np.empty(breaks.size + 2, dtype=np.int64)
+        boundaries[0] = 0
+        boundaries[1:-1] = breaks
+        boundaries[-1] = len(x)
     else:
-        if not np.sum(rowsize) == len(x):
-            raise ValueError("The sum of rowsize must equal the length of x.")
-        segment_sizes = []
-        start = 0
-        for r in rowsize:
-            end = start + int(r)
-            segment_sizes.append(segment(x[start:end], tolerance))
-            start = end
-        return np.concatenate(segment_sizes)
+        # row boundaries always divide segments, so only keep the gaps that
+        # exceed the tolerance within rows and merge them with the row indices
+        row_index = rowsize_to_index(rowsize)
+        inner = row_index[(row_index > 0) & (row_index < len(x))]
+        exceeds_tolerance[inner - 1] = False
+        boundaries = np.sort(
+            np.concatenate((row_index, np.flatnonzero(exceeds_tolerance) + 1))
+        )
+    return np.diff(boundaries)
 
 
 def subset(
@@ -576,7 +665,8 @@ def subset(
         Dictionary containing the variables (as keys) and the ranges/values/functions (as values) to subset.
     id_var_name : str, optional
         Name of the variable with dimension `row_dim_name` containing the identification number of the
-        rows (default is "id").
+        rows (default is "id"). Rows are matched to their observations by position, so this parameter
+        is only kept for backward compatibility.
     rowsize_var_name : str, optional
         Name of the variable containing the number of observations per row (default is "rowsize").
     row_dim_name : str, optional
@@ -715,12 +805,11 @@ def subset(
     --------
     :func:`apply_ragged`
     """
-    mask_row = xr.DataArray(
-        data=np.ones(ds.sizes[row_dim_name], dtype="bool"), dims=[row_dim_name]
-    )
-    mask_obs = xr.DataArray(
-        data=np.ones(ds.sizes[obs_dim_name], dtype="bool"), dims=[obs_dim_name]
-    )
+    # the masks of each dimension are combined in place, and every criterion
+    # is written into the same scratch buffer of its dimension
+    mask_row = np.ones(ds.sizes[row_dim_name], dtype="bool")
+    mask_obs = np.ones(ds.sizes[obs_dim_name], dtype="bool")
+    scratch = {}
 
     for key in criteria.keys():
         if np.all(np.isin(key, ds.variables) | np.isin(key, ds.dims)):
@@ -736,53 +825,47 @@ def subset(
                 criterion_dims = criterion.dims
 
             if row_dim_name in criterion_dims:
-                mask_row = np.logical_and(
-                    mask_row,
-                    _mask_var(
-                        criterion, criteria[key], ds[rowsize_var_name], row_dim_name
-                    ),
-                )
+                dim_name, mask = row_dim_name, mask_row
             elif obs_dim_name in criterion_dims:
-                mask_obs = np.logical_and(
-                    mask_obs,
-                    _mask_var(
-                        criterion, criteria[key], ds[rowsize_var_name], obs_dim_name
-                    ),
-                )
+                dim_name, mask = obs_dim_name, mask_obs
+            else:
+                continue
+
+            if dim_name not in scratch:
+                scratch[dim_name] = np.empty_like(mask)
+            mask &= _mask_var(
+                criterion,
+                criteria[key],
+                ds[rowsize_var_name],
+                dim_name,
+                out=scratch[dim_name],
+            )
         else:
             raise ValueError(f"Unknown variable '{key}'.")
 
     # remove data when rows are filtered
-    traj_idx = rowsize_to_index(ds[rowsize_var_name].values)
-    for i in np.where(~mask_row)[0]:
-        mask_obs[slice(traj_idx[i], traj_idx[i + 1])] = False
-
-    # remove rows completely filtered in mask_obs
-    ids_with_mask_obs = np.repeat(ds[id_var_name].values, ds[rowsize_var_name].values)[
-        mask_obs
-    ]
-    mask_row = np.logical_and(
-        mask_row, np.in1d(ds[id_var_name], np.unique(ids_with_mask_obs))
-    )
+    rowsize = ds[rowsize_var_name].values
+    traj_idx = rowsize_to_index(rowsize)
+    mask_obs &= np.repeat(mask_row, rowsize)
+
+    # remove rows completely filtered in mask_obs; rows being contiguous, the
+    # number of observations kept in each row is a difference of cumulative sums
+    kept_obs = np.concatenate(([0], np.cumsum(mask_obs)))
+    kept_rowsize = np.diff(kept_obs[traj_idx])
+    mask_row &= kept_rowsize > 0
 
     # reset mask_obs to True if we want to keep complete rows
     if full_rows:
-        for i in np.where(mask_row)[0]:
-            mask_obs[slice(traj_idx[i], traj_idx[i + 1])] = True
-        ids_with_mask_obs = np.repeat(
-            ds[id_var_name].values, ds[rowsize_var_name].values
-        )[mask_obs]
+        mask_obs |= np.repeat(mask_row, rowsize)
+        kept_rowsize = rowsize
 
-    if not any(mask_row):
+    if not mask_row.any():
         warnings.warn("No data matches the criteria; returning an empty dataset.")
         return xr.Dataset()
     else:
         # apply the filtering for both dimensions
         ds_sub = ds.isel({row_dim_name: mask_row, obs_dim_name: mask_obs})
-        _, unique_idx, sorted_rowsize = np.unique(
-            ids_with_mask_obs, return_index=True, return_counts=True
-        )
-        ds_sub[rowsize_var_name].values = sorted_rowsize[np.argsort(unique_idx)]
+        ds_sub[rowsize_var_name].values = kept_rowsize[mask_row]
         return ds_sub
 
 
@@ -791,7 +874,8 @@ def unpack(
     rowsize: np.ndarray | xr.DataArray,
     rows: int | Iterable[int] = None,
     axis: int = 0,
-) -> list[np.ndarray | xr.DataArray]:
+    lazy: bool = False,
+) -> list[np.ndarray | xr.DataArray] | Iterator[np.ndarray | xr.DataArray]:
     """Unpack a ragged array into a list of regular arrays.
 
     Unpacking a ``np.ndarray`` ragged array is about 2 orders of magnitude
@@ -809,12 +893,16 @@ def unpack(
         A row or list of rows to unpack. Default is None, which unpacks all rows.
     axis : int, optional
         The axis along which to unpack the ragged array. Default is 0.
+    lazy : bool, optional
+        If True, return an iterator that slices each row only when it is
+        requested, instead of a list of all the rows. Default is False.
 
     Returns
     -------
-    list
-        A list of array-likes with sizes that correspond to the values in
-        rowsize, and types that correspond to the type of ragged_array
+    list or Iterator
+        A list (or an iterator if ``lazy`` is True) of array-likes with sizes
+        that correspond to the values in rowsize, and types that correspond to
+        the type of ragged_array
 
     Examples
     --------
@@ -835,23 +923,85 @@ def unpack(
 
     >>> from clouddrift.kinematics import velocity_from_position
 
-    >>> for lon, lat, time in list(zip(
-    ...     unpack(ds.lon.values, ds["rowsize"]),
-    ...     unpack(ds.lat.values, ds["rowsize"]),
-    ...     unpack(ds.time.values, ds["rowsize"])
-    ... )):
+    >>> for lon, lat, time in zip(
+    ...     unpack(ds.lon.values, ds["rowsize"], lazy=True),
+    ...     unpack(ds.lat.values, ds["rowsize"], lazy=True),
+    ...     unpack(ds.time.values, ds["rowsize"], lazy=True)
+    ... ):
     ...     u, v = velocity_from_position(lon, lat, time)
     """
+    if not isinstance(ragged_array, xr.DataArray):
+        ragged_array = np.asarray(ragged_array)
     indices = rowsize_to_index(rowsize)
 
     if rows is None:
+        if not lazy:
+            if axis == 0 and isinstance(ragged_array, np.ndarray):
+                # slicing a plain array directly avoids the np.split machinery
+                bounds = indices.tolist()
+                return [ragged_array[i:j] for i, j in zip(bounds[:-1], bounds[1:])]
+            return np.split(ragged_array, indices[1:-1], axis=axis)
         rows = range(indices.size - 1)
-    if isinstance(rows, (int, np.integer)):
-        rows = [rows]
+    else:
+        # only slice the requested rows rather than splitting the whole array
+        rows = _normalize_rows(rows, indices.size - 1)
 
-    unpacked = np.split(ragged_array, indices[1:-1], axis=axis)
+    key = (slice(None),) * axis
+    unpacked = (ragged_array[key + (slice(indices[i], indices[i + 1]),)] for i in rows)
+    return unpacked if lazy else list(unpacked)
 
-    return [unpacked[i] for i in rows]
+
+def unpack_flat(
+    ragged_array: np.ndarray | xr.DataArray,
+    rowsize: np.ndarray | xr.DataArray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return a ragged array as a flat array together with the indices of its rows.
+
+    Unlike :func:`unpack`, no array is created for each row: row ``i`` of the
+    ragged array is ``array[indices[i] : indices[i + 1]]``, so that rows can be
+    sliced only when they are needed, or reduced all at once from the indices.
+    Note that ``np.add.reduceat(array, indices[:-1])`` is only correct if no row
+    is empty; differences of a cumulative sum also handle empty rows.
+
+    Parameters
+    ----------
+    ragged_array : array-like
+        A ragged array
+    rowsize : array-like
+        An array of integers whose values is the size of each row in the ragged
+        array
+
+    Returns
+    -------
+    array : np.ndarray
+        The ragged array as a ``np.ndarray``, without copying it if possible
+    indices : np.ndarray
+        The indices of the rows in ``array``, as returned by
+        :func:`rowsize_to_index`
+
+    Raises
+    ------
+    ValueError
+        If the sum of ``rowsize`` does not equal the length of ``ragged_array``.
+
+    Examples
+    --------
+    >>> from clouddrift.ragged import unpack_flat
+    >>> array, indices = unpack_flat(np.array([1, 2, 3, 4, 5]), [2, 0, 3])
+    >>> indices
+    array([0, 2, 2, 5])
+    >>> np.diff(np.concatenate(([0], np.cumsum(array)))[indices])
+    array([ 3,  0, 12])
+
+    See Also
+    --------
+    :func:`unpack`, :func:`rowsize_to_index`
+    """
+    array = np.asarray(ragged_array)
+    indices = rowsize_to_index(rowsize)
+    if indices[-1] != len(array):
+        raise ValueError("The sum of rowsize must equal the length of ragged_array.")
+    return array, indices
 
 
 def obs_index_to_row(
@@ -891,27 +1041,37 @@ def obs_index_to_row(
     [0, 1, 1]
 
     """
-    # convert index to list if it is not
-    if isinstance(index, xr.DataArray):
-        index_list = [int(i) for i in index.values]
-    elif isinstance(index, np.ndarray):
-        index_list = [int(i) for i in index]
-    elif isinstance(index, int):
-        index_list = [index]
-    else:
-        index_list = index
-
-    # if index is not a list of integers or integer-likes, raise an error
-    if not all(isinstance(i, int) for i in index_list):
+    # a single index is looked up directly, without converting it to an array,
+    # which keeps calls in a loop over individual observations cheap
+    if isinstance(index, (int, np.integer)) and not isinstance(index, bool):
+        rowsize_index = rowsize_to_index(rowsize)
+        if not rowsize_index[0] <= index < rowsize_index[-1]:
+            raise ValueError("Input index out of bounds based on input rowsize")
+        return [int(np.searchsorted(rowsize_index, index, side="right")) - 1]
+
+    index = np.atleast_1d(np.asarray(index))
+    if index.size == 0:
+        return []
+
+    # if index is not an integer or an array of integers, raise an error
+    if not np.issubdtype(index.dtype, np.integer):
         raise ValueError("The index must be an integer or a list of integers.")
 
+    # match the dtype of the row indices so that the search does not need to
+    # cast either array, nor promote both to float for unsigned indices
+    index = index.astype(np.int64, copy=False)
     rowsize_index = rowsize_to_index(rowsize)
 
     # test that no index is out of bounds
-    if any([(i < rowsize_index[0]) | (i >= rowsize_index[-1]) for i in index_list]):
+    if ((index < rowsize_index[0]) | (index >= rowsize_index[-1])).any():
         raise ValueError("Input index out of bounds based on input rowsize")
 
-    return (np.searchsorted(rowsize_index, index_list, side="right") - 1).tolist()
+    # for many indices, gathering from a table of the row of every observation
+    # is cheaper than a binary search per index
+    if rowsize_index[-1] <= _MAX_OBS_PER_INDEX_LOOKUP * index.size:
+        rows = np.repeat(np.arange(rowsize_index.size - 1), np.diff(rowsize_index))
+        return rows[index].tolist()
+    return (np.searchsorted(rowsize_index, index, side="right") - 1).tolist()
 
 
 def _mask_var(
@@ -919,6 +1079,7 @@ def _mask_var(
     criterion: tuple | list | np.ndarray | xr.DataArray | bool | float | int | Callable,
     rowsize: xr.DataArray = None,
     dim_name: str = "dim_0",
+    out: np.ndarray | None = None,
 ) -> xr.DataArray:
     """Return the mask of a subset of the data matching a test criterion.
 
@@ -936,6 +1097,11 @@ def _mask_var(
         List of integers specifying the number of data points in each row
     dim_name : str, optional
         Name of the masked dimension (default is "dim_0")
+    out : np.ndarray, optional
+        Boolean array with the shape of ``var`` in which to write the mask. If
+        provided, ``out`` is returned instead of a new mask. Numeric and datetime
+        ranges and values are compared directly into ``out``, other criteria are
+        copied into it.
 
     Examples
     --------
@@ -971,7 +1137,7 @@ def _mask_var(
 
     Returns
     -------
-    mask : xr.DataArray
+    mask : xr.DataArray or np.ndarray
         The mask of the subset of the data matching the criteria
     """
     if not callable(criterion) and isinstance(var, list):
@@ -979,11 +1145,28 @@ def _mask_var(
             "The `var` parameter can be a `list` only if the `criterion` is a `Callable`."
         )
 
+    # compare the underlying arrays and only wrap the resulting mask, which
+    # avoids creating intermediate DataArrays for each comparison
+    values = var.values if isinstance(var, xr.DataArray) else var
+
     if isinstance(criterion, tuple):  # min/max defining range
-        mask = np.logical_and(var >= criterion[0], var <= criterion[1])
+        # bounds such as ``ds.lon.min()`` are compared as arrays, like the values
+        criterion = tuple(
+            c.values if isinstance(c, xr.DataArray) else c for c in criterion
+        )
+        if out is not None and _compares_natively(values, *criterion):
+            np.greater_equal(values, criterion[0], out=out)
+            out &= values <= criterion[1]
+            return out
+        # combine the bounds in place to allocate one temporary array fewer
+        mask = values >= criterion[0]
+        mask &= values <= criterion[1]
+        mask = _wrap_mask(var, mask)
     elif isinstance(criterion, (list, np.ndarray, xr.DataArray)):
         # select multiple values
-        mask = np.isin(var, criterion)
+        if isinstance(criterion, xr.DataArray):
+            criterion = criterion.values
+        mask = _isin(np.asarray(values), np.asarray(criterion))
     elif callable(criterion):
         # mask directly created by applying `criterion` function
         if not isinstance(var, list):
@@ -991,15 +1174,195 @@ def _mask_var(
 
         if len(var[0]) == len(rowsize):
             mask = criterion(*var)
+        elif getattr(var[0], "chunks", None) is not None:
+            # dask-backed variables are masked lazily, one block at a time
+            mask = _apply_ragged_chunked(criterion, var, np.asarray(rowsize))
         else:
             mask = apply_ragged(criterion, var, rowsize)
 
-        mask = xr.DataArray(data=mask, dims=[dim_name]).astype(bool)
+        # only cast when needed, as criteria usually already return booleans
+        if getattr(mask, "dtype", None) != np.dtype(bool):
+            mask = (
+                mask.astype(bool)
+                if hasattr(mask, "astype")
+                else np.asarray(mask, dtype=bool)
+            )
+        mask = xr.DataArray(data=mask, dims=[dim_name])
 
         if not len(var[0]) == len(mask):
             raise ValueError(
                 "The `Callable` function must return a masked array that matches the length of the variable to filter."
             )
     else:  # select one specific value
-        mask = var == criterion
+        if out is not None and _compares_natively(values, criterion):
+            return np.equal(values, criterion, out=out)
+        mask = _wrap_mask(var, values == criterion)
+
+    if out is not None:
+        np.copyto(out, mask)
+        return out
     return mask
+
+
+def _apply_ragged_chunked(
+    func: Callable,
+    var: list[xr.DataArray],
+    rowsize: np.ndarray,
+) -> "da.Array":
+    """Apply ``func`` to each row of dask-backed variables, block by block.
+
+    The chunk boundaries are first moved to the nearest following row
+    boundary so that no row is split between two blocks, then ``apply_ragged``
+    is mapped over the blocks with the row sizes of the rows each block holds.
+    The result is a lazy dask array of booleans.
+    """
+    import dask.array as da
+
+    indices = rowsize_to_index(rowsize)
+    chunk_ends = np.cumsum(var[0].chunks[0])
+    bounds = np.unique(
+        np.concatenate(([0], indices[np.searchsorted(indices, chunk_ends)]))
+    )
+    row_bounds = np.searchsorted(indices, bounds)
+    chunks = (tuple(np.diff(bounds).tolist()),)
+
+    def func_block(*blocks, block_info=None):
+        block = np.searchsorted(bounds, block_info[0]["array-location"][0][0])
+        block_rowsize = rowsize[row_bounds[block] : row_bounds[block + 1]]
+        return np.asarray(apply_ragged(func, list(blocks), block_rowsize), dtype=bool)
+
+    arrays = [da.asarray(v.data).rechunk(chunks) for v in var]
+    return da.map_blocks(func_block, *arrays, dtype=bool)
+
+
+def _compares_natively(values: np.ndarray, *criteria) -> bool:
+    """Return whether numpy comparison ufuncs can write the comparison of
+    ``values`` with ``criteria`` into a boolean ``out`` array.
+
+    Bounds such as ``pd.Timestamp`` can only be compared with the comparison
+    operators, and strings only have comparison ufunc loops in recent numpy
+    versions, so both are left to the operators.
+    """
+    kinds = "biufcmM"
+    return (
+        isinstance(values, np.ndarray)
+        and values.dtype.kind in kinds
+        and all(np.asarray(c).dtype.kind in kinds for c in criteria)
+    )
+
+
+def _wrap_mask(
+    var: xr.DataArray | np.ndarray, mask: np.ndarray
+) -> xr.DataArray | np.ndarray:
+    """Wrap ``mask`` in a DataArray with the dimensions and coordinates of ``var``
+    if ``var`` is a DataArray."""
+    if isinstance(var, xr.DataArray):
+        # a shallow copy reuses the coordinates without validating them again
+        mask = var.copy(deep=False, data=mask)
+        mask.attrs = {}
+    return mask
+
+
+def _isin(values: np.ndarray, criterion: np.ndarray) -> np.ndarray:
+    """Return a boolean mask of the elements of ``values`` that are in ``criterion``.
+
+    This is equivalent to ``np.isin(values, criterion)``, but when both arrays
+    can be compared, looks up each value in the sorted criterion with a single
+    ``np.searchsorted`` call instead of sorting ``values`` together with the
+    criterion. Integer criteria spanning a small range are left to ``np.isin``,
+    which uses a faster lookup table for them, and criteria of a few values
+    are compared one by one, which takes a single pass over ``values`` each.
+    """
+    kinds = {values.dtype.kind, criterion.dtype.kind}
+    if "O" in kinds or not (len(kinds) == 1 or kinds <= set("biuf")):
+        return np.isin(values, criterion)
+
+    criterion = criterion.ravel()
+    if 0 < criterion.size <= _MAX_ISIN_EQUALITIES:
+        mask = values == criterion[0]
+        for value in criterion[1:]:
+            mask |= values == value
+        return mask
+
+    criterion = np.sort(criterion, axis=None)
+    if criterion.size == 0:
+        return np.zeros(values.shape, dtype=bool)
+    if kinds <= set("iu"):
+        # same condition as np.isin uses to choose its lookup table
+        criterion_range = int(criterion[-1]) - int(criterion[0])
+        if criterion_range <= 6 * (values.size + criterion.size):
+            return np.isin(values, criterion)
+    idx = np.searchsorted(criterion, values)
+    np.clip(idx, 0, criterion.size - 1, out=idx)
+    return criterion[idx] == values
+
+
+@lru_cache(maxsize=64)
+def _make_chunker(
+    length: int, overlap: int, align: str
+) -> Callable[[np.ndarray], np.ndarray]:
+    """Return a function that chunks an array for fixed ``length``, ``overlap``,
+    and ``align`` arguments of :func:`chunk`.
+
+    The arguments are validated only once per combination, and the returned
+    function only computes the number of chunks and the offset of the first
+    chunk for each array it is called with.
+    """
+    if length < 0:
+        raise ValueError("length must be a non-negative integer.")
+    if overlap > length:
+        raise ValueError("overlap must be smaller than length.")
+
+    try:
+        half_remainders = _ALIGN[align]
+    except KeyError:
+        raise ValueError("align must be one of 'start', 'middle', or 'end'.")
+
+    def chunker(x: np.ndarray) -> np.ndarray:
+        # the strided view below only steps along the first axis
+        if x.ndim != 1:
+            raise ValueError("x must be a one-dimensional array.")
+
+        num_chunks = (
+            (len(x) - length) // (length - overlap) + 1 if len(x) >= length else 0
+        )
+        if num_chunks == 0:
+            return np.empty((0, length), dtype=x.dtype)
+
+        remainder = len(x) - num_chunks * length + (num_chunks - 1) * overlap
+        start = half_remainders * remainder // 2
+
+        # View the chunked part of the array as a (num_chunks, length) array
+        # whose rows start every `length - overlap` elements, which works for
+        # both positive and negative overlap, and copy the strided view into a
+        # new contiguous array in a single operation. Building the view
+        # directly has a much lower per-call overhead than
+        # `sliding_window_view`, which matters when chunking many short rows
+        # with `apply_ragged`. Contiguous numeric arrays can be viewed through
+        # their buffer, which is cheaper still than `as_strided`.
+        step = x.strides[0]
+        shape = (num_chunks, length)
+        strides = (step * (length - overlap), step)
+        if x.flags.c_contiguous and x.dtype.kind in "biufc":
+            windows = np.ndarray(
+                shape, x.dtype, buffer=x, offset=start * step, strides=strides
+            )
+        else:
+            windows = np.lib.stride_tricks.as_strided(
+                x[start:], shape=shape, strides=strides, writeable=False
+            )
+        return windows.copy()
+
+    return chunker
+
+
+def _normalize_rows(rows: int | Iterable[int], num_rows: int) -> np.ndarray:
+    """Return ``rows``, given as an integer or an iterable of integers, as an
+    array of row numbers between 0 and ``num_rows - 1``.
+
+    Any iterable is accepted, including tuples, which NumPy would otherwise
+    read as an index along several axes. Negative rows count from the end.
+    """
+    if not isinstance(rows, (int, np.integer, np.ndarray)):
+        rows = list(rows)
+    return np.atleast_1d(np.arange(num_rows)[np.asarray(rows, dtype=np.intp)])
@@ -9,6 +9,7 @@ import xarray as xr
 
 from clouddrift.kinematics import velocity_from_position
 from clouddrift.ragged import (
+    _mask_var,
     apply_ragged,
     chunk,
     obs_index_to_row,
@@ -18,9 +19,17 @@ from clouddrift.ragged import (
     segment,
     subset,
     unpack,
+    unpack_flat,
 )
 from clouddrift.raggedarray import RaggedArray
 
+try:
+    import dask  # noqa: F401
+
+    has_dask = True
+except ImportError:
+    has_dask = False
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -153,6 +162,10 @@ class chunk_tests(unittest.TestCase):
         with self.assertRaises(ValueError):
             chunk([1], 1, align="wrong")
 
+        # When x is not one-dimensional, the function raises a ValueError
+        with self.assertRaises(ValueError):
+            chunk(np.arange(10).reshape(5, 2), 2)
+
     def test_chunk_overlap(self):
         # Simple chunk with overlap
         self.assertTrue(
@@ -280,6 +293,11 @@ class prune_tests(unittest.TestCase):
             with self.assertRaises(IndexError):
                 x_new, rowsize_new = prune(data, rowsize, minimum)
 
+    def test_prune_empty_rows(self):
+        x_new, rowsize_new = prune(np.array([]), [0, 0], 1)
+        self.assertEqual(len(x_new), 0)
+        self.assertEqual(len(rowsize_new), 0)
+
     def test_print_incompatible_rowsize(self):
         x = [1, 2, 3, 1, 2]
         rowsize = [3, 3]
@@ -321,6 +339,15 @@ class segment_tests(unittest.TestCase):
         self.assertTrue(isinstance(segment_sizes, np.ndarray))
         self.assertTrue(np.all(segment_sizes == np.array([1, 3, 2, 4, 1])))
 
+    def test_segment_rowsize_empty_rows(self):
+        x = [0, 1, 1, 1, 2, 2, 3, 3, 3, 3, 4]
+        tol = 0.5
+        rowsize = [0, 3, 0, 2, 6, 0]
+        segment_sizes = segment(x, tol, rowsize)
+        self.assertTrue(
+            np.all(segment_sizes == np.array([0, 1, 2, 0, 1, 1, 1, 4, 1, 0]))
+        )
+
     def test_segment_positive_and_negative_tolerance(self):
         x = [1, 1, 2, 2, 1, 1, 2, 2]
         segment_sizes = segment(x, 0.5, rowsize=segment(x, -0.5))
@@ -487,6 +514,11 @@ class apply_ragged_tests(unittest.TestCase):
         )
         self.assertTrue(np.all(y == np.array([1, 4, 9, 16])))
 
+        for rows in [(1, 0), {1}, (i for i in [1])]:
+            y = apply_ragged(lambda x: x**2, np.array([1, 2, 3, 4]), [2, 2], rows=rows)
+            expected = [9, 16, 1, 4] if isinstance(rows, tuple) else [9, 16]
+            self.assertTrue(np.all(y == np.array(expected)))
+
     def test_with_axis(self):
         # Test that axis=0 is the default.
         x = np.arange(6).reshape((3, 2))
@@ -522,6 +554,34 @@ class apply_ragged_tests(unittest.TestCase):
         self.assertTrue(np.all(y[0] == np.mean(x, axis=0)))
         self.assertTrue(np.all(y[1] == np.std(x, axis=0)))
 
+    def test_default_executor_long_rows(self):
+        # long rows are processed in a thread pool created for the call
+        x = np.arange(6000)
+        rowsize = [2500, 1500, 2000]
+        y = apply_ragged(lambda x: x - x[0], x, rowsize)
+        self.assertTrue(np.all(y == np.concatenate([np.arange(r) for r in rowsize])))
+
+    def test_vectorized(self):
+        def func(x, indices):
+            rowsize = np.diff(indices)
+            return x - np.repeat(x[indices[:-1]], rowsize)
+
+        func.__vectorized__ = True
+
+        expected = apply_ragged(lambda x: x - x[0], self.x, self.rowsize)
+        y = apply_ragged(func, self.x, self.rowsize)
+        self.assertTrue(np.all(y == expected))
+
+        y = apply_ragged(func, self.x, self.rowsize, rows=[0, 2])
+        self.assertTrue(np.all(y == expected[[0, 1, 5, 6, 7, 8]]))
+
+        y = apply_ragged(func, self.x, self.rowsize, rows=1)
+        self.assertTrue(np.all(y == expected[2:5]))
+
+        for rows in [(0, 2), (i for i in [0, 2])]:
+            y = apply_ragged(func, self.x, self.rowsize, rows=rows)
+            self.assertTrue(np.all(y == expected[[0, 1, 5, 6, 7, 8]]))
+
     def test_velocity_ndarray(self):
         for executor in [futures.ThreadPoolExecutor(), futures.ProcessPoolExecutor()]:
             u, v = apply_ragged(
@@ -672,6 +732,34 @@ class subset_tests(unittest.TestCase):
         ds_sub = subset(self.ds, {"id": self.ds["id"][:2].values})
         self.assertTrue(ds_sub["id"].size == 2)
 
+    def test_float_arraylike_criterion(self):
+        ds_sub = subset(self.ds, {"lon": [51.0, 113.0, 200.5]})
+        self.assertTrue(all(ds_sub["id"] == [1, 3]))
+        self.assertTrue(all(ds_sub["lon"] == [51, 113]))
+        self.assertTrue(all(ds_sub["rowsize"] == [1, 1]))
+
+    def test_arraylike_criterion_sizes(self):
+        lon = self.ds["lon"].values
+        for size in range(1, 12):
+            criterion = np.unique(lon)[::2][:size]
+            ds_sub = subset(self.ds, {"lon": criterion})
+            self.assertTrue(all(ds_sub["lon"] == lon[np.isin(lon, criterion)]))
+
+    def test_dataarray_criterion_bounds(self):
+        lon = self.ds["lon"]
+        expected = subset(self.ds, {"lon": (float(lon.min()), 10)})
+        ds_sub = subset(self.ds, {"lon": (lon.min(), 10)})
+        xr.testing.assert_equal(ds_sub, expected)
+
+        expected = subset(
+            self.ds, {"lon": (float(lon.quantile(0.1)), float(lon.quantile(0.9)))}
+        )
+        ds_sub = subset(self.ds, {"lon": (lon.quantile(0.1), lon.quantile(0.9))})
+        xr.testing.assert_equal(ds_sub, expected)
+
+        ds_sub = subset(self.ds, {"lon": lon.max()})
+        self.assertTrue(all(ds_sub["lon"] == float(lon.max())))
+
     def test_full_rows(self):
         ds_id_rowsize = {
             i: j for i, j in zip(self.ds.id.values, self.ds.rowsize.values)
@@ -698,6 +786,13 @@ class subset_tests(unittest.TestCase):
         ds_sub = subset(self.ds, {"time": (4, 5)}, full_rows=True)
         xr.testing.assert_equal(self.ds, ds_sub)
 
+    def test_duplicate_ids(self):
+        ds_dup = self.ds.copy()
+        ds_dup["id"].values = [1, 1, 2]
+        ds_sub = subset(ds_dup, {"lon": (100, 120)})
+        self.assertTrue(all(ds_sub["rowsize"] == [2]))
+        self.assertTrue(all(ds_sub["lon"] == [103, 113]))
+
     def test_subset_by_rows(self):
         rows = [0, 2]  # test extracting first and third rows
         ds_sub = subset(self.ds, {"rows": rows})
@@ -718,6 +813,42 @@ class subset_tests(unittest.TestCase):
         self.assertTrue(all(ds_sub["id"] == [1, 2]))
         self.assertTrue(all(ds_sub["rowsize"] == [5, 4]))
 
+    @unittest.skipUnless(has_dask, "requires dask")
+    def test_subset_callable_chunked(self):
+        func = lambda arr: ((arr - arr[0]) % 2) == 0
+        expected = subset(self.ds, {"time": func})
+        for size in [1, 2, 4, 100]:
+            ds_sub = subset(self.ds.chunk({"obs": size}), {"time": func})
+            xr.testing.assert_equal(ds_sub.compute(), expected)
+
+    def test_subset_callable_ndarray(self):
+        # plain arrays have no chunks and are masked with apply_ragged
+        mask = _mask_var(np.arange(5), lambda a: a > a[0], xr.DataArray([2, 3]))
+        np.testing.assert_equal(mask.values, [False, True, False, True, True])
+
+    def test_mask_var_out(self):
+        x = xr.DataArray(np.arange(5))
+        time = xr.DataArray(
+            np.arange("2000-01-01", "2000-01-06", dtype="datetime64[D]")
+        )
+        names = xr.DataArray(np.array(["a", "b", "a", "c", "b"]))
+        for var, criterion, expected in [
+            (x, (1, 3), [False, True, True, True, False]),
+            (x, 2, [False, False, True, False, False]),
+            (x, [0, 4], [True, False, False, False, True]),
+            (x, lambda arr: arr > 1, [False, False, True, True, True]),
+            (
+                time,
+                (pd.Timestamp("2000-01-02"), pd.Timestamp("2000-01-03")),
+                [False, True, True, False, False],
+            ),
+            (names, "a", [True, False, True, False, False]),
+        ]:
+            out = np.zeros(5, dtype=bool)
+            mask = _mask_var(var, criterion, xr.DataArray([5]), out=out)
+            self.assertIs(mask, out)
+            np.testing.assert_equal(out, expected)
+
     def test_subset_callable_tuple(self):
         func = lambda arr1, arr2: np.logical_and(
             arr1 >= 0, arr2 >= 30
@@ -809,6 +940,60 @@ class unpack_tests(unittest.TestCase):
             )
         )
 
+    def test_unpack_lazy(self):
+        ds = sample_ragged_array().to_xarray()
+        x = ds.lon.values
+        rowsize = ds.rowsize.values
+
+        for rows in [None, 1, [0, 2]]:
+            lazy = unpack(x, rowsize, rows, lazy=True)
+            self.assertNotIsInstance(lazy, list)
+            expected = unpack(x, rowsize, rows)
+            result = list(lazy)
+            self.assertEqual(len(result), len(expected))
+            for a, b in zip(result, expected):
+                np.testing.assert_equal(a, b)
+
+        lazy = unpack(ds.lon, ds["rowsize"], lazy=True)
+        self.assertIsInstance(next(lazy), xr.DataArray)
+
+        expected = unpack(x, rowsize, [2, 0])
+        for make_rows in [lambda: (2, 0), lambda: (i for i in [2, 0])]:
+            for lazy in [False, True]:
+                result = list(unpack(x, rowsize, make_rows(), lazy=lazy))
+                self.assertEqual(len(result), len(expected))
+                for a, b in zip(result, expected):
+                    np.testing.assert_equal(a, b)
+
+        for lazy in [False, True]:
+            for rows in [None, 1]:
+                result = list(unpack([1, 2, 3, 4, 5], [2, 3], rows, lazy=lazy))
+                expected = [[1, 2], [3, 4, 5]] if rows is None else [[3, 4, 5]]
+                self.assertEqual(len(result), len(expected))
+                for a, b in zip(result, expected):
+                    self.assertIsInstance(a, np.ndarray)
+                    np.testing.assert_equal(a, b)
+
+
+class unpack_flat_tests(unittest.TestCase):
+    def test_unpack_flat(self):
+        ds = sample_ragged_array().to_xarray()
+        array, indices = unpack_flat(ds.lon, ds["rowsize"])
+        self.assertIsInstance(array, np.ndarray)
+        rows = unpack(ds.lon.values, ds["rowsize"])
+        self.assertEqual(len(indices), len(rows) + 1)
+        for i, row in enumerate(rows):
+            np.testing.assert_equal(array[indices[i] : indices[i + 1]], row)
+
+    def test_unpack_flat_no_copy(self):
+        x = np.arange(5)
+        array, _ = unpack_flat(x, [2, 3])
+        self.assertIs(array, x)
+
+    def test_unpack_flat_wrong_rowsize(self):
+        with self.assertRaises(ValueError):
+            unpack_flat(np.arange(5), [2, 2])
+
 
 class obs_index_to_row_tests(unittest.TestCase):
     def test_obs_index_to_row(self):
@@ -864,3 +1049,23 @@ class obs_index_to_row_tests(unittest.TestCase):
         rowsize = [2, 5, 3]
         with self.assertRaises(ValueError):
             obs_index_to_row(index, rowsize)
+
+    def test_obs_index_to_row_non_integer(self):
+        rowsize = [2, 5, 3]
+        with self.assertRaises(ValueError):
+            obs_index_to_row([0.5, 1], rowsize)
+        with self.assertRaises(ValueError):
+            obs_index_to_row(np.array([0.0, 1.0]), rowsize)
+
+    def test_obs_index_to_row_few_and_many(self):
+        rowsize = [0, 2, 0, 300, 1, 0, 3, 0]
+        expected = np.repeat(np.arange(len(rowsize)), rowsize)
+        few = [0, 1, 2, 301, 302, 305]
+        self.assertEqual(obs_index_to_row(few, rowsize), expected[few].tolist())
+        many = np.arange(sum(rowsize))
+        self.assertEqual(obs_index_to_row(many, rowsize), expected.tolist())
+
+        rowsize = xr.DataArray(np.array(rowsize, dtype=float))
+        self.assertEqual(obs_index_to_row(few, rowsize), expected[few].tolist())
+        self.assertEqual(obs_index_to_row(many, rowsize), expected.tolist())
+        self.assertEqual(obs_index_to_row([1], xr.DataArray([2.0, 3.0])), [0])